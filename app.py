@@ -1,18 +1,95 @@
 import os
 import re
+import math
+import time
+import queue
+import atexit
+import threading
+from functools import lru_cache
+import numpy as np
 import pandas as pd
+# pyarrow imports this lazily the first time a DataFrame is converted to an
+# Arrow table for writing, which fails if that first save is the flush at
+# interpreter exit; import it up front instead.
+import pyarrow.pandas_compat  # noqa: F401
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import io
-import csv
+from openpyxl import Workbook
 from flask import Flask, request, jsonify, render_template, Response
-from datetime import datetime
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy version below still works
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 app = Flask(__name__)
 
-EXCEL_FILE = "candidate_data.xlsx"
+DATA_FILE = "candidate_data.parquet"
+LEGACY_EXCEL_FILE = "candidate_data.xlsx"  # read once to migrate old deployments
+# Parquet schema metadata key marking files written by save_candidate_data,
+# which only ever contain rows already validated by predict() or cleaning.
+# _bootstrap still re-checks marks in tagged files before trusting them
+CLEAN_METADATA_KEY = b"gate_rank_predictor.cleaned"
+SAVE_DELAY_SECONDS = 1.0  # coalesce writes that happen within this window
+PENDING_FLUSH_ROWS = 256  # merge buffered new rows into the DataFrame beyond this
+SKETCH_SIZE = 10_000  # beyond this many marks, M_t is estimated from a random sample
+SHIFTS = ["Morning", "Afternoon"]
+# [0-9], not \d: Python's \d also matches non-ASCII digits, while the RE2
+# engine behind pyarrow.compute (clean_candidate_data) does not
+CANDIDATE_ID_RE = re.compile(r'^CS[0-9]{2}S[0-9]{8}$')
+# In-memory column types: candidate_id lives in an Arrow string buffer and the
+# low-cardinality columns are categoricals (int codes, not Python strings)
+COLUMN_DTYPES = {
+    "candidate_id": "string[pyarrow]",
+    "shift": pd.CategoricalDtype(SHIFTS),
+    "branch": pd.CategoricalDtype(["CSE"]),
+}
+# Column order and header labels for /admin/download
+EXPORT_COLUMNS = ["candidate_id", "marks", "branch", "shift", "timestamp"]
+EXPORT_HEADERS = ["Candidate ID", "Marks", "Branch", "Shift", "Timestamp"]
+CSV_CHUNK_ROWS = 10_000  # rows per chunk when streaming the CSV export
+
+# Process-wide candidate data. Hold "lock" while reading or mutating the data
+# keys; "save_lock" is separate and never needed for the data itself.
+_CACHE = {
+    # Loaded from disk once, then mutated in place
+    "df": None,
+    # New rows as dicts, merged into "df" in batches
+    "pending": [],
+    # candidate_id -> row label in "df" (labels past its end refer to
+    # "pending", in order); also the set of known candidates
+    "index": {},
+    # Bumped on every change; keys the memoized statistics
+    "version": 0,
+    # Set on change, cleared once a save has written the change to disk
+    "dirty": False,
+    "lock": threading.Lock(),
+    # Serializes Parquet writes. Taken without "lock" (and before it, when
+    # both are needed) so requests never wait on disk I/O
+    "save_lock": threading.Lock(),
+}
+# Changed candidate IDs, consumed by the background writer thread
+_SAVE_QUEUE = queue.Queue()
 
 # ------------------------------------------------------------------------------
 # 1) DATA CLEANING
 # ------------------------------------------------------------------------------
+def _to_utf8(series):
+    """
+    Column as an Arrow string array for the pyarrow.compute kernels.
+    Missing values become null; non-strings (e.g. numbers typed into the old
+    Excel sheet) are converted with str().
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.astype(str), type=pa.string())
+
 def clean_candidate_data(df):
     """
     Clean and validate candidate data:
@@ -20,132 +97,432 @@ def clean_candidate_data(df):
       - marks must be numeric and between 0 and 100.
       - shift must be "Morning" or "Afternoon".
       - branch must be "CSE".
-    Invalid rows are removed.
+      - timestamp is stored as int64 epoch nanoseconds (UTC).
+    Invalid rows are removed; columns are returned with COLUMN_DTYPES.
     """
     if df.empty:
-        return df
+        return df.astype({**COLUMN_DTYPES, "timestamp": "int64"})
 
+    # String columns are normalized and checked with Arrow's vectorized kernels
     # Normalize candidate_id
-    df["candidate_id"] = df["candidate_id"].astype(str).str.strip().str.upper()
-    pattern = r'^CS\d{2}S\d{8}$'
-    df = df[df["candidate_id"].str.fullmatch(pattern, na=False)]
-
-    # Normalize marks
-    df["marks"] = pd.to_numeric(df["marks"], errors="coerce")
-    df = df[df["marks"].between(0, 100)]
+    candidate_id = pc.utf8_upper(pc.utf8_trim_whitespace(_to_utf8(df["candidate_id"])))
+    valid = pc.match_substring_regex(candidate_id, CANDIDATE_ID_RE.pattern)
 
     # Normalize shift
-    df["shift"] = df["shift"].astype(str).str.strip().str.capitalize()
-    df = df[df["shift"].isin(["Morning", "Afternoon"])]
+    shift = pc.utf8_capitalize(pc.utf8_trim_whitespace(_to_utf8(df["shift"])))
+    valid = pc.and_(valid, pc.is_in(shift, value_set=pa.array(SHIFTS)))
 
     # Normalize branch (should be "CSE")
-    df["branch"] = df["branch"].astype(str).str.strip().str.upper()
-    df = df[df["branch"] == "CSE"]
+    branch = pc.utf8_upper(pc.utf8_trim_whitespace(_to_utf8(df["branch"])))
+    valid = pc.and_(valid, pc.equal(branch, "CSE"))
+
+    # Normalize marks
+    marks = pd.to_numeric(df["marks"], errors="coerce").astype(float)
+    keep = pc.fill_null(valid, False).to_numpy(zero_copy_only=False) & marks.between(0, 100).to_numpy()
+
+    df = df.assign(
+        candidate_id=pd.arrays.ArrowStringArray(candidate_id),
+        marks=marks,
+        shift=shift.to_numpy(zero_copy_only=False),
+        branch=branch.to_numpy(zero_copy_only=False),
+    )[keep]
+
+    # Normalize timestamp (older files store datetimes; missing values become NaT)
+    if not pd.api.types.is_integer_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce").astype("int64")
 
-    return df
+    # One row per candidate (keep the latest), as predict() assumes
+    df = df.drop_duplicates(subset="candidate_id", keep="last")
+
+    return df.astype(COLUMN_DTYPES).reset_index(drop=True)
 
 # ------------------------------------------------------------------------------
 # 2) FILE LOAD/SAVE
 # ------------------------------------------------------------------------------
 def load_candidate_data():
-    if os.path.exists(EXCEL_FILE):
-        try:
-            df = pd.read_excel(EXCEL_FILE)
-            df = clean_candidate_data(df)
-            # Optionally save cleaned data back to Excel
-            save_candidate_data(df)
-            return df
-        except Exception as e:
-            app.logger.error(f"Error reading Excel file: {e}")
-            return pd.DataFrame(columns=["candidate_id", "marks", "branch", "shift", "timestamp"])
-    else:
-        return pd.DataFrame(columns=["candidate_id", "marks", "branch", "shift", "timestamp"])
+    """
+    Read stored candidate data. Returns (df, is_clean), where is_clean means
+    the file was written by save_candidate_data and needs no cleaning.
+    """
+    try:
+        if os.path.exists(DATA_FILE):
+            table = pq.read_table(DATA_FILE)
+            is_clean = (table.schema.metadata or {}).get(CLEAN_METADATA_KEY) == b"1"
+            return table.to_pandas(), is_clean
+        elif os.path.exists(LEGACY_EXCEL_FILE):
+            return pd.read_excel(LEGACY_EXCEL_FILE), False
+        else:
+            return pd.DataFrame(columns=["candidate_id", "marks", "branch", "shift", "timestamp"]), False
+    except Exception as e:
+        app.logger.error(f"Error reading data file: {e}")
+        return pd.DataFrame(columns=["candidate_id", "marks", "branch", "shift", "timestamp"]), False
 
 def save_candidate_data(df):
+    """
+    Write df to DATA_FILE; returns whether it succeeded.
+    Callers must hold _CACHE["save_lock"].
+    """
     try:
-        df.to_excel(EXCEL_FILE, index=False)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, CLEAN_METADATA_KEY: b"1"})
+        # Write a temp file and swap it in, so readers never see a partial file
+        tmp_file = DATA_FILE + ".tmp"
+        pq.write_table(table, tmp_file, compression="snappy")
+        os.replace(tmp_file, DATA_FILE)
+        return True
     except Exception as e:
-        app.logger.error(f"Error writing Excel file: {e}")
+        app.logger.error(f"Error writing data file: {e}")
+        return False
+
+def write_excel(df, target):
+    """
+    Write df as an .xlsx workbook to a path or file object. Uses openpyxl's
+    write-only mode, which streams rows out instead of building the sheet
+    in memory as pandas' to_excel does.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(EXPORT_HEADERS)
+    for row in df[EXPORT_COLUMNS].itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(target)
+
+def get_df():
+    """
+    Return the cached candidate DataFrame (loaded by _bootstrap).
+    Callers must hold _CACHE["lock"].
+    """
+    return _CACHE["df"]
+
+def flush_pending():
+    """
+    Merge buffered new rows into the cached DataFrame in one concat.
+    Callers must hold _CACHE["lock"].
+    """
+    if _CACHE["pending"]:
+        new_rows = pd.DataFrame(_CACHE["pending"]).astype(COLUMN_DTYPES)
+        _CACHE["df"] = pd.concat([_CACHE["df"], new_rows], ignore_index=True)
+        _CACHE["pending"].clear()
+
+def snapshot_df():
+    """
+    Return a copy of all candidate data, including rows not yet merged.
+    Callers must hold _CACHE["lock"].
+    """
+    df = _CACHE["df"]
+    if not _CACHE["pending"]:
+        return df.copy()
+    new_rows = pd.DataFrame(_CACHE["pending"]).astype(COLUMN_DTYPES)
+    return pd.concat([df, new_rows], ignore_index=True)
+
+def schedule_save(candidate_id):
+    """
+    Hand a change to the writer thread; the request does not wait for the
+    disk write. Callers must hold _CACHE["lock"].
+    """
+    _CACHE["dirty"] = True
+    _SAVE_QUEUE.put(candidate_id)
+
+def flush_cache():
+    """
+    Write the cache to disk if it has unsaved changes. Waits for a save that
+    is already in progress first. Returns False if the save failed, in which
+    case the changes stay dirty so a later flush retries them.
+    """
+    with _CACHE["save_lock"]:
+        with _CACHE["lock"]:
+            if not _CACHE["dirty"]:
+                return True
+            flush_pending()
+            df = _CACHE["df"].copy()
+            version = _CACHE["version"]
+        if not save_candidate_data(df):
+            return False
+        with _CACHE["lock"]:
+            # Changes made while the file was being written still need a save
+            if _CACHE["version"] == version:
+                _CACHE["dirty"] = False
+        return True
+
+def _writer():
+    """
+    Writer thread: after the first change in a burst, wait SAVE_DELAY_SECONDS,
+    drop the changes queued meanwhile and write everything in one save.
+    """
+    while True:
+        _SAVE_QUEUE.get()
+        time.sleep(SAVE_DELAY_SECONDS)
+        try:
+            while True:
+                _SAVE_QUEUE.get_nowait()
+        except queue.Empty:
+            pass
+        if not flush_cache():
+            _SAVE_QUEUE.put(None)  # retry after the next delay
+
+@atexit.register
+def _flush_on_exit():
+    # The writer is a daemon thread and is killed after this runs; flush_cache
+    # waits for any save it has in progress and then writes what is left
+    flush_cache()
 
 # ------------------------------------------------------------------------------
 # 3) HELPER FUNCTIONS FOR GATE CALCULATIONS
 # ------------------------------------------------------------------------------
-def compute_cutoff(df):
+class WelfordState:
+    """
+    Running count, mean and sum of squared deviations (Welford's algorithm),
+    so mean/std stay available in O(1) as marks are added or removed.
+    """
+    def __init__(self, values=()):
+        values = np.asarray(values, dtype=float)
+        self.n = len(values)
+        self.mean = values.mean() if self.n else 0.0
+        self.m2 = ((values - self.mean) ** 2).sum() if self.n else 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+
+    @property
+    def std(self):
+        """Sample std dev (ddof=1); 0 when fewer than two values."""
+        if self.n < 2:
+            return 0.0
+        return (self.m2 / (self.n - 1)) ** 0.5
+
+class MarksBuffer:
+    """
+    Contiguous float64 array of marks, one slot per candidate, grown
+    geometrically. Removal moves the last slot into the freed one, so
+    values stays a dense view that numpy can reduce directly.
+    """
+    def __init__(self, candidate_ids=(), values=()):
+        values = np.asarray(values, dtype=float)
+        self._marks = np.empty(max(1024, 2 * len(values)))
+        self._marks[:len(values)] = values
+        self._ids = list(candidate_ids)
+        self._slots = {cid: i for i, cid in enumerate(self._ids)}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, candidate_id):
+        return candidate_id in self._slots
+
+    @property
+    def values(self):
+        return self._marks[:len(self._ids)]
+
+    def item(self, slot):
+        """(candidate_id, marks) stored in a slot, 0 <= slot < len(self)."""
+        return self._ids[slot], self._marks[slot]
+
+    def add(self, candidate_id, marks):
+        n = len(self._ids)
+        if n == len(self._marks):
+            grown = np.empty(2 * n)
+            grown[:n] = self._marks
+            self._marks = grown
+        self._marks[n] = marks
+        self._ids.append(candidate_id)
+        self._slots[candidate_id] = n
+
+    def set(self, candidate_id, marks):
+        self._marks[self._slots[candidate_id]] = marks
+
+    def remove(self, candidate_id):
+        slot = self._slots.pop(candidate_id)
+        last_id = self._ids.pop()
+        if last_id != candidate_id:
+            self._marks[slot] = self._marks[len(self._ids)]
+            self._ids[slot] = last_id
+            self._slots[last_id] = slot
+
+class MarksReservoir:
+    """
+    Uniform random sample of at most SKETCH_SIZE candidates' marks, kept
+    with Algorithm R as candidates are added. The unsampled candidates are
+    kept in their own MarksBuffer, so when a sampled candidate leaves, its
+    slot is refilled with one random draw from them and the sample stays a
+    uniform subset of the population.
+    """
+    def __init__(self, candidate_ids=(), values=()):
+        values = np.asarray(values, dtype=float)
+        candidate_ids = np.asarray(candidate_ids, dtype=object)
+        sampled = np.ones(len(values), dtype=bool)
+        if len(values) > SKETCH_SIZE:
+            sampled[:] = False
+            sampled[_RNG.choice(len(values), SKETCH_SIZE, replace=False)] = True
+        self._sample = MarksBuffer(candidate_ids[sampled], values[sampled])
+        self._rest = MarksBuffer(candidate_ids[~sampled], values[~sampled])
+
+    @property
+    def values(self):
+        return self._sample.values
+
+    def add(self, candidate_id, marks):
+        if len(self._sample) < SKETCH_SIZE:
+            self._sample.add(candidate_id, marks)
+            return
+        slot = _RNG.integers(len(self._sample) + len(self._rest) + 1)
+        if slot < SKETCH_SIZE:
+            evicted_id, evicted_marks = self._sample.item(slot)
+            self._sample.remove(evicted_id)
+            self._rest.add(evicted_id, evicted_marks)
+            self._sample.add(candidate_id, marks)
+        else:
+            self._rest.add(candidate_id, marks)
+
+    def set(self, candidate_id, marks):
+        if candidate_id in self._sample:
+            self._sample.set(candidate_id, marks)
+        else:
+            self._rest.set(candidate_id, marks)
+
+    def remove(self, candidate_id):
+        if candidate_id in self._rest:
+            self._rest.remove(candidate_id)
+            return
+        self._sample.remove(candidate_id)
+        if len(self._rest):
+            refill_id, refill_marks = self._rest.item(_RNG.integers(len(self._rest)))
+            self._rest.remove(refill_id)
+            self._sample.add(refill_id, refill_marks)
+
+_RNG = np.random.default_rng()
+
+# Running statistics, marks arrays and samples for all data and per session.
+# Guarded by _CACHE["lock"] like the DataFrame they describe.
+_STATS = {"global": WelfordState(), **{shift: WelfordState() for shift in SHIFTS}}
+_MARKS = {"global": MarksBuffer(), **{shift: MarksBuffer() for shift in SHIFTS}}
+_SKETCH = {"global": MarksReservoir(), **{shift: MarksReservoir() for shift in SHIFTS}}
+
+def rebuild_stats(df, candidate_ids):
+    """
+    Recompute the running statistics, marks arrays and samples from scratch
+    (used after loading). candidate_ids is df["candidate_id"] already
+    materialized as an object array, since iterating the Arrow-backed column
+    element by element is slow.
+    """
+    marks = df["marks"].to_numpy(dtype=float)
+    _STATS["global"] = WelfordState(marks)
+    _MARKS["global"] = MarksBuffer(candidate_ids, marks)
+    _SKETCH["global"] = MarksReservoir(candidate_ids, marks)
+    for shift in SHIFTS:
+        mask = (df["shift"] == shift).to_numpy()
+        _STATS[shift] = WelfordState(marks[mask])
+        _MARKS[shift] = MarksBuffer(candidate_ids[mask], marks[mask])
+        _SKETCH[shift] = MarksReservoir(candidate_ids[mask], marks[mask])
+
+def track_marks(candidate_id, shift, marks, old_shift=None, old_marks=None):
+    """Apply an insert, or an update when old_shift/old_marks are given, to _STATS, _MARKS and _SKETCH."""
+    if old_shift is not None:
+        _STATS["global"].remove(old_marks)
+        _STATS[old_shift].remove(old_marks)
+        _MARKS["global"].set(candidate_id, marks)
+        _SKETCH["global"].set(candidate_id, marks)
+        if old_shift == shift:
+            _MARKS[shift].set(candidate_id, marks)
+            _SKETCH[shift].set(candidate_id, marks)
+        else:
+            _MARKS[old_shift].remove(candidate_id)
+            _MARKS[shift].add(candidate_id, marks)
+            _SKETCH[old_shift].remove(candidate_id)
+            _SKETCH[shift].add(candidate_id, marks)
+    else:
+        _MARKS["global"].add(candidate_id, marks)
+        _MARKS[shift].add(candidate_id, marks)
+        _SKETCH["global"].add(candidate_id, marks)
+        _SKETCH[shift].add(candidate_id, marks)
+    _STATS["global"].add(marks)
+    _STATS[shift].add(marks)
+
+def compute_cutoff(state):
     """
     Compute M_q for general category using the GATE formula:
        M_q = max(25, min(40, mu + sigma))
-    where mu is the mean, sigma is the std dev of all marks.
+    where mu is the mean, sigma is the std dev of the marks tracked by state
+    (all marks, or one session for multi-session normalization).
     """
-    if df.empty:
+    if state.n == 0:
         return 25.0  # Fallback if no data
+    return max(25, min(40, state.mean + state.std))
 
-    mu = df["marks"].mean()
-    sigma = df["marks"].std(ddof=1)  # sample std dev
-    if pd.isna(sigma):
-        sigma = 0.0
-    return max(25, min(40, mu + sigma))
+def compute_top_mean(marks):
+    """
+    Compute M_t = mean of top 0.1% of the marks array (or at least 1 candidate).
+    Could also enforce a minimum of top 10 if desired.
+    """
+    if len(marks) == 0:
+        return 80.0
+    top_count = max(1, int(len(marks) * 0.001))
+    # Partial selection: only the top_count largest end up in the tail
+    return np.partition(marks, -top_count)[-top_count:].mean()
 
-def compute_cutoff_for_session(df, shift):
+def top_mean(key):
     """
-    Compute M_q for the session (e.g. "Morning" or "Afternoon")
-    using the same formula. This is needed for multi-session normalization.
+    M_t for "global" or a shift: exact up to SKETCH_SIZE marks, estimated
+    from the reservoir sample beyond that so the cost stays bounded.
     """
-    session_df = df[df["shift"] == shift]
-    if session_df.empty:
-        return 25.0
-    mu_s = session_df["marks"].mean()
-    sigma_s = session_df["marks"].std(ddof=1)
-    if pd.isna(sigma_s):
-        sigma_s = 0.0
-    return max(25, min(40, mu_s + sigma_s))
+    if len(_MARKS[key]) <= SKETCH_SIZE:
+        return compute_top_mean(_MARKS[key].values)
+    return compute_top_mean(_SKETCH[key].values)
 
-def compute_top_mean(df):
+@lru_cache(maxsize=8)
+def _cached_stats(version, shift):
     """
-    Compute M_t = mean of top 0.1% marks (or at least 1 candidate).
-    Could also enforce a minimum of top 10 if desired.
+    Return (M_q_global, M_t_global, M_q_session, M_t_session) for a data
+    version. The data cannot change without bumping the version, so repeated
+    requests between writes reuse the result. Callers must hold _CACHE["lock"].
     """
-    if df.empty:
-        return 80.0
-    sorted_df = df.sort_values(by="marks", ascending=False)
-    count = len(sorted_df)
-    top_count = max(1, int(count * 0.001))
-    top_candidates = sorted_df.head(top_count)
-    return top_candidates["marks"].mean()
+    return (compute_cutoff(_STATS["global"]), top_mean("global"),
+            compute_cutoff(_STATS[shift]), top_mean(shift))
 
-def normalize_marks(raw_marks, shift):
+def bump_version():
+    """Mark the data as changed. Callers must hold _CACHE["lock"]."""
+    _CACHE["version"] += 1
+
+def apply_normalization(raw_marks, M_q_global, M_t_global, M_q_session, M_t_session):
     """
     Multi-session normalization (approx GATE approach):
        M_ij = M_q_global + ( (M_t_global - M_q_global)/(M_t_session - M_q_session) ) * ( raw_marks - M_q_session )
     If session top mean == session M_q => fallback to raw_marks.
+    raw_marks may be a single value or a NumPy array of marks from one session.
     """
-    df = load_candidate_data()
-
-    # Global cutoff & top mean
-    M_q_global = compute_cutoff(df)
-    M_t_global = compute_top_mean(df)
-
-    # Session cutoff & top mean
-    M_q_session = compute_cutoff_for_session(df, shift)
-    session_df = df[df["shift"] == shift]
-    M_t_session = compute_top_mean(session_df)
-
-    # If M_t_session == M_q_session => fallback
     if M_t_session == M_q_session:
-        normalized = raw_marks
-    else:
-        normalized = M_q_global + ((M_t_global - M_q_global) / (M_t_session - M_q_session)) * (raw_marks - M_q_session)
+        return raw_marks
+    return M_q_global + ((M_t_global - M_q_global) / (M_t_session - M_q_session)) * (raw_marks - M_q_session)
+
+def normalize_marks(raw_marks, shift):
+    """
+    Normalize one candidate's raw marks against the current data
+    (see apply_normalization). Callers must hold _CACHE["lock"].
+    """
+    # Global and session cutoff & top mean
+    M_q_global, M_t_global, M_q_session, M_t_session = _cached_stats(_CACHE["version"], shift)
+    normalized = apply_normalization(raw_marks, M_q_global, M_t_global, M_q_session, M_t_session)
 
     return normalized, M_t_global, M_t_session, M_q_global
 
-def compute_gate_score(marks, df):
+def compute_gate_score(marks, M_q, M_t):
     """
-    1) Compute M_q (cutoff) from entire data.
-    2) Compute M_t (top mean).
+    1) M_q is the cutoff for the entire data.
+    2) M_t is the top mean for the entire data.
     3) If marks < M_q => 100.
     4) Else linear interpolation between S_q=350 and S_t=1000.
     """
-    M_q = compute_cutoff(df)      # cutoff for entire data
-    M_t = compute_top_mean(df)    # top mean for entire data
     S_q = 350
     S_t = 1000
 
@@ -154,6 +531,43 @@ def compute_gate_score(marks, df):
 
     return S_q + (S_t - S_q) * ((marks - M_q) / (M_t - M_q))
 
+@njit(cache=True, fastmath=True)
+def gate_score_vec(marks, M_q, M_t, S_q=350.0, S_t=1000.0):
+    """
+    Array version of compute_gate_score for scoring many candidates at once
+    (branchless: marks below M_q are mapped to 100 with np.where).
+    """
+    scores = S_q + (S_t - S_q) * ((marks - M_q) / (M_t - M_q))
+    return np.where(marks < M_q, 100.0, scores)
+
+def _bootstrap():
+    """
+    Load and index the stored data once at startup. Data from older or
+    hand-edited files is cleaned and written back; files saved by this app
+    are already clean and only have their marks re-checked. Rows added later
+    are validated by predict() instead.
+    """
+    df, is_clean = load_candidate_data()
+    # Marks are cheap to re-check (no regex) and guard against tagged files
+    # from before predict() rejected NaN
+    if is_clean and not df["marks"].between(0, 100).all():
+        is_clean = False
+    needs_save = not is_clean and not df.empty
+    df = df.astype(COLUMN_DTYPES) if is_clean else clean_candidate_data(df)
+    with _CACHE["lock"]:
+        _CACHE["df"] = df
+        # Materialize the IDs once; the index and every MarksBuffer reuse them
+        candidate_ids = df["candidate_id"].to_numpy(dtype=object)
+        _CACHE["index"] = dict(zip(candidate_ids, df.index))
+        rebuild_stats(df, candidate_ids)
+        bump_version()
+    if needs_save:
+        with _CACHE["save_lock"]:
+            save_candidate_data(df)
+    threading.Thread(target=_writer, name="candidate-writer", daemon=True).start()
+
+_bootstrap()
+
 # ------------------------------------------------------------------------------
 # 4) ROUTES
 # ------------------------------------------------------------------------------
@@ -174,45 +588,63 @@ def predict():
     if not candidate_id or raw_marks is None or shift is None:
         return jsonify({"error": "Candidate ID, rawMarks, and shift are required"}), 400
 
+    # Validate shift (same normalization as clean_candidate_data)
+    shift = str(shift).strip().capitalize()
+    if shift not in SHIFTS:
+        return jsonify({"error": "Shift must be Morning or Afternoon."}), 400
+
     # Validate candidate_id format
-    pattern = r'^CS\d{2}S\d{8}$'
-    if not re.fullmatch(pattern, candidate_id):
+    if not CANDIDATE_ID_RE.fullmatch(candidate_id):
         return jsonify({"error": "Candidate ID must be in format CS##S######## (e.g., CS25S13049105)"}), 400
 
     # Validate marks
     try:
         raw_marks = float(raw_marks)
-        if raw_marks < 0 or raw_marks > 100:
+        if not math.isfinite(raw_marks) or not 0 <= raw_marks <= 100:
             return jsonify({"error": "Marks must be between 0 and 100."}), 400
     except ValueError:
         return jsonify({"error": "rawMarks must be a number"}), 400
 
-    # Load existing data & update or append
-    df = load_candidate_data()
     branch = "CSE"
 
-    if candidate_id in df["candidate_id"].astype(str).values:
-        df.loc[df["candidate_id"] == candidate_id, ["marks", "shift", "timestamp"]] = [
-            raw_marks, shift, datetime.utcnow()
-        ]
-    else:
-        new_entry = pd.DataFrame([{
-            "candidate_id": candidate_id,
-            "marks": raw_marks,
-            "branch": branch,
-            "shift": shift,
-            "timestamp": datetime.utcnow()
-        }])
-        df = pd.concat([df, new_entry], ignore_index=True)
-    save_candidate_data(df)
-
-    # Multi-session normalization
-    normalized_marks, global_mt, session_mt, M_q_global = normalize_marks(raw_marks, shift)
-
-    # Final GATE score
-    gate_score = compute_gate_score(normalized_marks, df)
-
-    user_count = df["candidate_id"].nunique()
+    with _CACHE["lock"]:
+        # Update or append in the in-memory data; disk is written in the background
+        df = get_df()
+        pending = _CACHE["pending"]
+        idx = _CACHE["index"].get(candidate_id)
+        if idx is not None and idx < len(df):
+            old_marks, old_shift = df.at[idx, "marks"], df.at[idx, "shift"]
+            df.at[idx, "marks"] = raw_marks
+            df.at[idx, "shift"] = shift
+            df.at[idx, "timestamp"] = time.time_ns()
+            track_marks(candidate_id, shift, raw_marks, old_shift, old_marks)
+        elif idx is not None:
+            row = pending[idx - len(df)]
+            old_marks, old_shift = row["marks"], row["shift"]
+            row.update(marks=raw_marks, shift=shift, timestamp=time.time_ns())
+            track_marks(candidate_id, shift, raw_marks, old_shift, old_marks)
+        else:
+            _CACHE["index"][candidate_id] = len(df) + len(pending)
+            pending.append({
+                "candidate_id": candidate_id,
+                "marks": raw_marks,
+                "branch": branch,
+                "shift": shift,
+                "timestamp": time.time_ns()
+            })
+            track_marks(candidate_id, shift, raw_marks)
+            if len(pending) > PENDING_FLUSH_ROWS:
+                flush_pending()
+        bump_version()
+        schedule_save(candidate_id)
+
+        # Multi-session normalization
+        normalized_marks, global_mt, session_mt, M_q_global = normalize_marks(raw_marks, shift)
+
+        # Final GATE score
+        gate_score = compute_gate_score(normalized_marks, M_q_global, global_mt)
+
+        user_count = len(_CACHE["index"])
 
     return jsonify({
         "candidate_id": candidate_id,
@@ -227,20 +659,59 @@ def predict():
 
 @app.route("/admin/data", methods=["GET"])
 def admin_data():
-    df = load_candidate_data()
+    with _CACHE["lock"]:
+        df = snapshot_df()
+    timestamps = pd.to_datetime(df["timestamp"], unit="ns")
+    # Stored epoch nanoseconds are UTC, so mark the strings with the "Z" offset
+    df["timestamp"] = timestamps.dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ").where(timestamps.notna(), None)
     data = df.to_dict(orient="records")
     return jsonify(data)
 
+@app.route("/admin/leaderboard", methods=["GET"])
+def admin_leaderboard():
+    """All candidates ranked by GATE score, using the same normalization as /api/predict."""
+    # Only the snapshot and stats lookups need the lock; scoring runs outside it
+    with _CACHE["lock"]:
+        df = snapshot_df()[["candidate_id", "shift", "marks"]]
+        stats = {shift: _cached_stats(_CACHE["version"], shift) for shift in SHIFTS}
+    normalized = np.empty(len(df))
+    scores = np.empty(len(df))
+    for shift in SHIFTS:
+        mask = (df["shift"] == shift).to_numpy()
+        M_q_global, M_t_global, M_q_session, M_t_session = stats[shift]
+        marks = apply_normalization(df["marks"].to_numpy(dtype=float)[mask],
+                                    M_q_global, M_t_global, M_q_session, M_t_session)
+        normalized[mask] = marks
+        scores[mask] = gate_score_vec(marks, M_q_global, M_t_global)
+    df = df.assign(normalizedMarks=normalized.round(2), gateScore=scores.round(2))
+    df = df.sort_values("gateScore", ascending=False, kind="stable")
+    df.insert(0, "rank", np.arange(1, len(df) + 1))
+    return jsonify(df.to_dict(orient="records"))
+
 @app.route("/admin/download", methods=["GET"])
 def admin_download():
-    df = load_candidate_data()
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(["Candidate ID", "Marks", "Branch", "Shift", "Timestamp"])
-    for _, row in df.iterrows():
-        cw.writerow([row["candidate_id"], row["marks"], row["branch"], row["shift"], row["timestamp"]])
-    output = si.getvalue()
-    return Response(output, mimetype="text/csv",
+    """CSV export by default; ?format=xlsx returns an Excel workbook instead."""
+    with _CACHE["lock"]:
+        df = snapshot_df()
+    timestamps = pd.to_datetime(df["timestamp"], unit="ns")
+
+    if request.args.get("format") == "xlsx":
+        df["timestamp"] = timestamps.astype(object).where(timestamps.notna(), None)
+        bio = io.BytesIO()
+        write_excel(df, bio)
+        return Response(bio.getvalue(), mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        headers={"Content-Disposition": "attachment;filename=candidate_data.xlsx"})
+
+    df["timestamp"] = timestamps
+    df = df[EXPORT_COLUMNS]
+
+    def generate():
+        # Stream the CSV so only one chunk of text is held in memory at a time
+        yield df.iloc[:0].to_csv(index=False, header=EXPORT_HEADERS)
+        for start in range(0, len(df), CSV_CHUNK_ROWS):
+            yield df.iloc[start:start + CSV_CHUNK_ROWS].to_csv(index=False, header=False)
+
+    return Response(generate(), mimetype="text/csv",
                     headers={"Content-Disposition": "attachment;filename=candidate_data.csv"})
 
 if __name__ == "__main__":